@@ -15,14 +15,14 @@ def is_file_image(path):
     if not filetype.helpers.is_image(path):
         logging.info("File '%s' is not an image according to filetype checker", path)
         return False
-    image = PIL.Image.open(path)
-    try:
-        image.verify()
-    except Exception as err:
-        logging.warning(
-            "File '%s' failed to be verified as an image '%s': '%s'",
-            path, err, err.message)
-        return False
+    with PIL.Image.open(path) as image:
+        try:
+            image.verify()
+        except Exception as err:
+            logging.warning(
+                "File '%s' failed to be verified as an image '%s'",
+                path, err)
+            return False
     #except PIL.UnidentifiedImageError:
     #    logging.warning("Unidentified Image '%s'", path)
     return True
@@ -3,7 +3,7 @@
 
 import os.path
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 from sqlalchemy.pool import StaticPool
 
@@ -18,7 +18,19 @@ class SharedBase(DeclarativeBase):
 DATABASE_FILE_PATH = os.path.join(params.FILES_LOCATION, params.DATABASE_NAME)
 BACKUP_DATABASE_FILE_PATH = f"{DATABASE_FILE_PATH}.bak"
 
+# Sessions are opened frequently (e.g. by properties polled by the UI), the default pool for a
+# database file keeps connections open between them so the pragmas below only run once per connection
 PERSISTENT_ENGINE = create_engine(f"sqlite:///{DATABASE_FILE_PATH}")
+
+@event.listens_for(PERSISTENT_ENGINE, "connect")
+def _setup_persistent_connection(dbapi_connection, connection_record):
+    """Use write-ahead logging so commits avoid a full fsync of the database"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
 PERSISTENT_SESSION = sessionmaker(PERSISTENT_ENGINE)
 
 RUNTIME_ENGINE = create_engine(
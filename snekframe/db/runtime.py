@@ -11,15 +11,6 @@ from .. import params
 class RuntimeBase(DeclarativeBase):
     """Runtime Base DB Class"""
 
-class ExistingFiles(RuntimeBase):
-    """Compare whether files already exist"""
-    __tablename__ = "existingphotos"
-
-    id: Mapped[int] = mapped_column(primary_key=True)
-    photolist_id: Mapped[int]
-    photo_path: Mapped[str] = mapped_column(String(params.MAX_PATH_SIZE))
-    found: Mapped[bool]
-
 class NumPhotos(RuntimeBase):
     """Number of existing photos in each directory"""
     __tablename__ = "numphotos"
@@ -37,4 +28,7 @@ class PhotoOrder(RuntimeBase):
 
     id : Mapped[int] = mapped_column(primary_key=True)
     photo_id : Mapped[int]
+    # Copied from the photo list so the slideshow only needs to read this table
+    path : Mapped[str] = mapped_column(String(params.MAX_PATH_SIZE))
+    filename : Mapped[str] = mapped_column(String(params.MAX_FILENAME_SIZE))
     lost : Mapped[int] = mapped_column(insert_default=False)
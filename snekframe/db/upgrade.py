@@ -53,6 +53,9 @@ def upgrade_database():
     else:
         raise Exception(f"Unknown database version v{version_major}.{version_minor}")
 
+    # Flush write-ahead log into the database file before taking the backup
+    with PERSISTENT_ENGINE.connect() as connection:
+        connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
     shutil.copyfile(DATABASE_FILE_PATH, BACKUP_DATABASE_FILE_PATH)
 
     for upgrade in upgrades_required:
@@ -339,6 +339,12 @@ class CheckBoxSelection(Enum):
 
 class CheckBoxButton(_Button):
     """Special version of radiobutton where selection has three states"""
+    _ICON_NAMES = {
+        CheckBoxSelection.Unselected: "empty_checkbox",
+        CheckBoxSelection.PartialSelect: "partial_checkbox",
+        CheckBoxSelection.Selected: "ticked_checkbox",
+    }
+
     def __init__(self, parent, select_command, unselect_command, enabled=True, selected=CheckBoxSelection.Unselected, style="Default", **label_kwargs):
         if not isinstance(selected, CheckBoxSelection):
             raise TypeError()
@@ -348,17 +354,19 @@ class CheckBoxButton(_Button):
 
         base_style_name = f"{style}.Icon.Button.TLabel"
 
-        self._unselected_inactive_icon = ICONS.get("empty_checkbox", **styles._ICON_STYLES[base_style_name])
-        self._unselected_active_icon = ICONS.get("empty_checkbox", **styles._ICON_STYLES[f"Active.{base_style_name}"])
-        self._unselected_disabled_icon = ICONS.get("empty_checkbox", **styles._ICON_STYLES[f"Disabled.{base_style_name}"])
-
-        self._partialselect_inactive_icon = ICONS.get("partial_checkbox", **styles._ICON_STYLES[base_style_name])
-        self._partialselect_active_icon = ICONS.get("partial_checkbox", **styles._ICON_STYLES[f"Active.{base_style_name}"])
-        self._partialselect_disabled_icon = ICONS.get("partial_checkbox", **styles._ICON_STYLES[f"Disabled.{base_style_name}"])
-
-        self._selected_inactive_icon = ICONS.get("ticked_checkbox", **styles._ICON_STYLES[base_style_name])
-        self._selected_active_icon = ICONS.get("ticked_checkbox", **styles._ICON_STYLES[f"Active.{base_style_name}"])
-        self._selected_disabled_icon = ICONS.get("ticked_checkbox", **styles._ICON_STYLES[f"Disabled.{base_style_name}"])
+        # Icons for each selection, by style
+        self._inactive_icons = {
+            selection: ICONS.get(icon_name, **styles._ICON_STYLES[base_style_name])
+            for selection, icon_name in self._ICON_NAMES.items()
+        }
+        self._active_icons = {
+            selection: ICONS.get(icon_name, **styles._ICON_STYLES[f"Active.{base_style_name}"])
+            for selection, icon_name in self._ICON_NAMES.items()
+        }
+        self._disabled_icons = {
+            selection: ICONS.get(icon_name, **styles._ICON_STYLES[f"Disabled.{base_style_name}"])
+            for selection, icon_name in self._ICON_NAMES.items()
+        }
 
         super().__init__(parent, ttk.Label, select_command, label_kwargs, enabled=enabled)
 
@@ -394,41 +402,17 @@ class CheckBoxButton(_Button):
                 self._style_disabled()
 
     def _style_normal(self):
-        if self._selected == CheckBoxSelection.Unselected:
-            image = self._unselected_inactive_icon
-        elif self._selected == CheckBoxSelection.PartialSelect:
-            image = self._partialselect_inactive_icon
-        elif self._selected == CheckBoxSelection.Selected:
-            image = self._selected_inactive_icon
-        else:
-            raise TypeError()
-
+        image = self._inactive_icons[self._selected]
         self._element.configure(image=image)
         self._element.image = image
 
     def _style_active(self):
-        if self._selected == CheckBoxSelection.Unselected:
-            image = self._unselected_active_icon
-        elif self._selected == CheckBoxSelection.PartialSelect:
-            image = self._partialselect_active_icon
-        elif self._selected == CheckBoxSelection.Selected:
-            image = self._selected_active_icon
-        else:
-            raise TypeError()
-
+        image = self._active_icons[self._selected]
         self._element.configure(image=image)
         self._element.image = image
 
     def _style_disabled(self):
-        if self._selected == CheckBoxSelection.Unselected:
-            image = self._unselected_disabled_icon
-        elif self._selected == CheckBoxSelection.PartialSelect:
-            image = self._partialselect_disabled_icon
-        elif self._selected == CheckBoxSelection.Selected:
-            image = self._selected_disabled_icon
-        else:
-            raise TypeError()
-
+        image = self._disabled_icons[self._selected]
         self._element.configure(image=image)
         self._element.image = image
 
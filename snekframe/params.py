@@ -8,6 +8,7 @@ WINDOW_HEIGHT : int = 800
 FILES_LOCATION = os.path.expanduser("~/.snekframe")
 DATABASE_NAME = "photos.db"
 PHOTOS_LOCATION = "files"
+RESIZED_CACHE_LOCATION = "resized"
 
 MAX_PATH_SIZE = 4096
 MAX_FILENAME_SIZE = 256
@@ -4,8 +4,8 @@ from __future__ import annotations
 from dataclasses import dataclass
 from enum import Enum, auto
 import logging
+import os
 import os.path
-import pathlib
 import threading
 import time
 from typing import Optional, List
@@ -13,17 +13,38 @@ import queue
 
 import tkinter as tk
 
-from sqlalchemy.sql.expression import select, delete, update, func, and_, or_, not_
+from sqlalchemy.sql.expression import select, insert, delete, update, func, and_, or_, not_, bindparam
 
-from PIL import Image as PIL_Image, ImageTk as PIL_ImageTk
+from PIL import Image as PIL_Image
 
 from ..analyse import is_file_image
 from ..db import RUNTIME_SESSION, PERSISTENT_SESSION, PhotoListV1
-from ..db.runtime import ExistingFiles, NumPhotos, PhotoOrder
-from .. import params
+from ..db.runtime import NumPhotos, PhotoOrder
+from .. import params, settings
 from ..params import WINDOW_HEIGHT, TITLE_BAR_HEIGHT
 from . import display
 
+# Number of rows fetched at a time when iterating over large queries
+_STREAM_BATCH_SIZE = 1024
+
+# Incremented whenever selections cached by PhotoInfo/CurrentDirectoryInfo may no longer
+# match the database (changes rolled back or photos rescanned)
+_selection_revision = 0
+
+def _invalidate_cached_selections():
+    global _selection_revision # pylint: disable=global-statement
+    _selection_revision += 1
+
+# Statements run for individual items, built once and given values when executed
+# Directories are matched with IS so that the root's NULL path/name also compares equal
+_PHOTO_SELECTED_STATEMENT = select(PhotoListV1.selected).where(PhotoListV1.id == bindparam("photo_id"))
+# No PhotoListV1 objects are held by the session, skip synchronising them
+_PHOTO_SET_SELECTED_STATEMENT = update(PhotoListV1).where(PhotoListV1.id == bindparam("photo_id")).values(selected=bindparam("selection")).execution_options(synchronize_session=False)
+_DIRECTORY_WHERE_CLAUSE = and_(NumPhotos.prefix_path.is_(bindparam("match_prefix_path")), NumPhotos.directory.is_(bindparam("match_directory")))
+_DIRECTORY_COUNTS_STATEMENT = select(NumPhotos.num_photos, NumPhotos.num_albums, NumPhotos.selected).where(_DIRECTORY_WHERE_CLAUSE)
+_DIRECTORY_SELECTED_STATEMENT = select(NumPhotos.selected).where(_DIRECTORY_WHERE_CLAUSE)
+_DIRECTORY_SET_SELECTED_STATEMENT = update(NumPhotos).where(_DIRECTORY_WHERE_CLAUSE).values(selected=bindparam("selection"))
+
 class PageDirection(Enum):
     Up = auto()
     Previous = auto()
@@ -108,6 +129,13 @@ class PhotoDirectorySelection(Enum):
                 return option
         raise KeyError()
 
+# Selection of a directory containing two items, indexed by each item's selection value
+_MERGED_SELECTION = (
+    (PhotoDirectorySelection.Not, PhotoDirectorySelection.Partial, PhotoDirectorySelection.Partial),
+    (PhotoDirectorySelection.Partial, PhotoDirectorySelection.Partial, PhotoDirectorySelection.Partial),
+    (PhotoDirectorySelection.Partial, PhotoDirectorySelection.Partial, PhotoDirectorySelection.All),
+)
+
 @dataclass
 class SelectViewUpdate(ItemViewUpdate):
     selection : PhotoDirectorySelection
@@ -125,7 +153,7 @@ class DirectionsUpdate(ViewUpdate):
 
 @dataclass
 class FullImageViewUpdate(ViewUpdate):
-    image : PIL_ImageTk.PhotoImage
+    image : PIL_Image.Image # Resized, the Tk image must be created on the main thread
 
 @dataclass
 class CommitUpdate(ViewUpdate):
@@ -133,7 +161,8 @@ class CommitUpdate(ViewUpdate):
     pass
 
 class _FileSystemExplorer:
-    def __init__(self):
+    def __init__(self, settings_container : settings.SettingsContainer):
+        self._settings = settings_container
         self._request_queue = queue.Queue()
         self._return_data_queue = queue.Queue()
         self._thread = None
@@ -379,13 +408,14 @@ class _FileSystemExplorer:
                         if not isinstance(directory_info[-1], CurrentDirectoryInfo):
                             # TODO: Thumbnails for directories
                             # For now only output normal image
-                            image = PIL_ImageTk.PhotoImage(display._resize_image(directory_info[-1].generate_image(), max_height=WINDOW_HEIGHT-TITLE_BAR_HEIGHT*2))
-                            self._return_data_queue.put(
-                                FullImageViewUpdate(
-                                    current_page_id=current_page_id,
-                                    image=image
+                            image = display._load_resized_image(directory_info[-1].photo_path, resample=self._settings.photo_resample_filter, max_height=WINDOW_HEIGHT-TITLE_BAR_HEIGHT*2)
+                            if image is not None:
+                                self._return_data_queue.put(
+                                    FullImageViewUpdate(
+                                        current_page_id=current_page_id,
+                                        image=image
+                                    )
                                 )
-                            )
 
                         current_display_stage.pop(0)
                     elif current_display_stage[0] == self._PageDisplayStage.SelectDirection:
@@ -550,6 +580,8 @@ class _FileSystemExplorer:
                                 session.commit()
                             else:
                                 session.rollback()
+                        if not item.save:
+                            _invalidate_cached_selections()
                         self._return_data_queue.put(
                             CommitUpdate(
                                 current_page_id=current_page_id
@@ -564,6 +596,9 @@ class _FileSystemExplorer:
 
 class PhotoInfo:
     """File Info"""
+    # Created for every item shown in the gallery, avoid a dict per instance
+    __slots__ = ("_path", "_filename", "_directory_info", "_persistent_session", "_id", "_selection", "_revision")
+
     def __init__(self, path : str, filename : str, parent : CurrentDirectoryInfo, persistent_session, selection, row_id):
         self._path = path
         self._filename = filename
@@ -578,6 +613,7 @@ class PhotoInfo:
             self._id = row_id
 
         self._selection = selection
+        self._revision = _selection_revision
 
     @property
     def name(self):
@@ -586,9 +622,10 @@ class PhotoInfo:
     @property
     def selected(self):
         """Whether the file is selected"""
-        if self._selection is None:
+        if self._selection is None or self._revision != _selection_revision:
+            self._revision = _selection_revision
             self._selection = self._persistent_session.scalars(
-                select(PhotoListV1.selected).where(PhotoListV1.id == self._id)
+                _PHOTO_SELECTED_STATEMENT, {"photo_id": self._id}
             ).one()
         return self._selection
 
@@ -600,16 +637,22 @@ class PhotoInfo:
         if selection != self.selected:
             self._selection = selection
             self._persistent_session.execute(
-                update(PhotoListV1).where(PhotoListV1.id == self._id).values(selected=selection)
+                _PHOTO_SET_SELECTED_STATEMENT, {"photo_id": self._id, "selection": selection}
             )
             if propagate_up:
                 self._directory_info._child_changed(selection)
 
-    def generate_image(self):
-        return PIL_Image.open(os.path.join(params.FILES_LOCATION, params.PHOTOS_LOCATION, self._path, self._filename))
+    @property
+    def photo_path(self):
+        return os.path.join(params.FILES_LOCATION, params.PHOTOS_LOCATION, self._path, self._filename)
 
 class CurrentDirectoryInfo:
     """Directory Info"""
+    __slots__ = (
+        "_path", "_name", "_runtime_session", "_persistent_session", "_full_path", "_parent",
+        "_num_photos", "_num_albums", "_selection", "_pages", "_num_items_per_page", "_revision",
+    )
+
     def __init__(self, runtime_session, persistent_session, prefix_path : Optional[str], directory : Optional[str], parent=None, num_photos=None, num_albums=None, selection=None, num_items_per_page=params.NUM_ITEMS_PER_GALLERY_PAGE):
         self._path = prefix_path
         self._name = directory
@@ -635,52 +678,55 @@ class CurrentDirectoryInfo:
             raise TypeError()
         self._selection = selection
 
-        self._pages = None
+        self._pages = {} # Only pages which have been viewed
         self._num_items_per_page = num_items_per_page
+        self._revision = _selection_revision
+
+    def _check_revision(self):
+        """Drop the cached selection if the database may have changed underneath it"""
+        if self._revision != _selection_revision:
+            self._revision = _selection_revision
+            # Loaded pages are kept as they may be on screen, their items check their own revision
+            self._selection = None
+
+    def _load_counts(self):
+        self._num_photos, self._num_albums, selected = self._runtime_session.execute(
+            _DIRECTORY_COUNTS_STATEMENT, {"match_prefix_path": self._path, "match_directory": self._name}
+        ).one()
+        if self._selection is None:
+            self._selection = PhotoDirectorySelection.value_to_enum(selected)
 
-    def _load_pages(self):
-        self._pages = []
-
-        if self._num_photos is None:
-            result = self._runtime_session.scalars(
-                select(NumPhotos).where(and_(NumPhotos.prefix_path == self._path, NumPhotos.directory == self._name))
-            ).one()
-            self._num_photos = result.num_photos
-            self._num_albums = result.num_albums
-            if self._selection is None:
-                self._selection = PhotoDirectorySelection.value_to_enum(result.selected)
+    def _load_page(self, page_number):
+        """Query only the albums and photos shown on a single page
 
-        self._pages.append([])
-        page_number = 0
+        Albums are listed before photos
+        """
+        page = []
+        first_item = page_number * self._num_items_per_page
 
-        if self._num_albums != 0:
-            result = self._runtime_session.scalars(
-                select(NumPhotos).where(and_(NumPhotos.prefix_path == self._full_path, NumPhotos.directory != None))
+        if first_item < self._num_albums:
+            result = self._runtime_session.execute(
+                select(NumPhotos.directory, NumPhotos.num_photos, NumPhotos.num_albums, NumPhotos.selected).where(and_(NumPhotos.prefix_path == self._full_path, NumPhotos.directory != None)).order_by(NumPhotos.id).limit(self._num_items_per_page).offset(first_item)
             )
-            for row in result:
-                if len(self._pages[page_number]) == self._num_items_per_page:
-                    self._pages.append([])
-                    page_number += 1
-
-                self._pages[page_number].append(
-                    self.__class__(
-                        self._runtime_session, self._persistent_session, self._full_path, row.directory, parent=self, num_photos=row.num_photos, num_albums=row.num_albums, selection=PhotoDirectorySelection.value_to_enum(row.selected)
-                    )
+            page = [
+                self.__class__(
+                    self._runtime_session, self._persistent_session, self._full_path, directory, parent=self, num_photos=num_photos, num_albums=num_albums, selection=PhotoDirectorySelection.value_to_enum(selected)
                 )
-        if self._num_photos != 0:
-            image_path = "" if self._path is None else self._path
-            if self._name is not None:
-                image_path = os.path.join(image_path, self._name)
-            result = self._persistent_session.scalars(
-                select(PhotoListV1).where(PhotoListV1.path == image_path)
+                for directory, num_photos, num_albums, selected in result
+            ]
+
+        num_remaining = self._num_items_per_page - len(page)
+        if self._num_photos != 0 and num_remaining > 0:
+            image_path = "" if self._full_path is None else self._full_path
+            result = self._persistent_session.execute(
+                select(PhotoListV1.id, PhotoListV1.filename, PhotoListV1.selected).where(PhotoListV1.path == image_path).order_by(PhotoListV1.id).limit(num_remaining).offset(max(0, first_item - self._num_albums))
             )
-            for row in result:
-                if len(self._pages[page_number]) == self._num_items_per_page:
-                    self._pages.append([])
-                    page_number += 1
-                self._pages[page_number].append(
-                    PhotoInfo(row.path, row.filename, self, self._persistent_session, row.selected, row.id)
-                )
+            page += [
+                PhotoInfo(image_path, filename, self, self._persistent_session, selected, row_id)
+                for row_id, filename, selected in result
+            ]
+
+        return page
 
     @property
     def name(self):
@@ -689,10 +735,11 @@ class CurrentDirectoryInfo:
     @property
     def selected(self):
         """Whether the entire directory is selected"""
+        self._check_revision()
         if self._selection is None:
             self._selection = PhotoDirectorySelection.value_to_enum(
                 self._runtime_session.scalars(
-                    select(NumPhotos.selected).where(and_(NumPhotos.prefix_path == self._path, NumPhotos.directory == self._name))
+                    _DIRECTORY_SELECTED_STATEMENT, {"match_prefix_path": self._path, "match_directory": self._name}
                 ).one()
             )
         return self._selection
@@ -704,71 +751,109 @@ class CurrentDirectoryInfo:
     def _set_selected(self, selection : bool, propagate_up : bool = True, propagate_down : bool = True):
         if (selection and self.selected != PhotoDirectorySelection.All) or (not selection and self.selected != PhotoDirectorySelection.Not):
             self._selection = PhotoDirectorySelection.All if selection else PhotoDirectorySelection.Not
-            self._runtime_session.execute(
-                update(NumPhotos).where(and_(NumPhotos.prefix_path == self._path, NumPhotos.directory == self._name)).values(selected=PhotoDirectorySelection.All.value if selection else PhotoDirectorySelection.Not.value)
-            )
+            if propagate_down:
+                self._set_subtree_selected(selection)
+            else:
+                self._runtime_session.execute(
+                    _DIRECTORY_SET_SELECTED_STATEMENT, {"match_prefix_path": self._path, "match_directory": self._name, "selection": self._selection.value}
+                )
             if propagate_up and self._parent is not None:
                 self._parent._child_changed(selection)
-            if propagate_down:
-                for page_index in range(self.num_pages):
-                    for item in self.get_page(page_index):
-                        item._set_selected(selection, propagate_up=False)
+
+    def _set_subtree_selected(self, selection : bool):
+        """Update this directory and everything inside it with one statement per table"""
+        num_photos_update = update(NumPhotos)
+        photo_list_update = update(PhotoListV1)
+        if self._full_path is not None:
+            subdirectory_prefix = self._full_path + os.sep
+            num_photos_update = num_photos_update.where(
+                or_(
+                    and_(NumPhotos.prefix_path == self._path, NumPhotos.directory == self._name),
+                    NumPhotos.prefix_path == self._full_path,
+                    NumPhotos.prefix_path.startswith(subdirectory_prefix, autoescape=True)
+                )
+            )
+            photo_list_update = photo_list_update.where(
+                or_(
+                    PhotoListV1.path == self._full_path,
+                    PhotoListV1.path.startswith(subdirectory_prefix, autoescape=True)
+                )
+            )
+
+        self._runtime_session.execute(num_photos_update.values(selected=self._selection.value))
+        self._persistent_session.execute(photo_list_update.values(selected=selection))
+        self._set_loaded_selected(selection)
+
+    def _set_loaded_selected(self, selection : bool):
+        """Match any already loaded items to a selection made in the database"""
+        self._selection = PhotoDirectorySelection.All if selection else PhotoDirectorySelection.Not
+        for page in self._pages.values():
+            for item in page:
+                if isinstance(item, CurrentDirectoryInfo):
+                    item._set_loaded_selected(selection)
+                else:
+                    item._selection = selection
 
     def _child_changed(self, selection):
         if not isinstance(selection, (bool, PhotoDirectorySelection)):
             raise TypeError()
 
         if selection == PhotoDirectorySelection.Partial:
-            self._selection = selection
+            total_selection = selection
+        else:
+            total_selection = self._get_contents_selection()
+
+        if total_selection != self.selected:
+            self._selection = total_selection
             self._runtime_session.execute(
-                update(NumPhotos).where(and_(NumPhotos.prefix_path == self._path, NumPhotos.directory == self._name)).values(selected=selection.value)
+                _DIRECTORY_SET_SELECTED_STATEMENT, {"match_prefix_path": self._path, "match_directory": self._name, "selection": total_selection.value}
             )
             if self._parent is not None:
-                self._parent._child_changed(selection)
-        else:
-            if isinstance(selection, PhotoDirectorySelection):
-                total_selection = selection
-            elif selection:
-                total_selection = PhotoDirectorySelection.All
-            else:
-                total_selection = PhotoDirectorySelection.Not
-            selection_discovered = False
-            for page_index in range(self.num_pages):
-                for item in self.get_page(page_index):
-                    if item.selected == PhotoDirectorySelection.Partial:
-                        # We'll already be in partial, stop propagating
-                        return
-                    if isinstance(item.selected, bool):
-                        item_selection = PhotoDirectorySelection.All if item.selected else PhotoDirectorySelection.Not
-                    else:
-                        item_selection = item.selected
-                    if item_selection != total_selection:
-                        total_selection = PhotoDirectorySelection.Partial
-                        selection_discovered = True
-                        break
-                if selection_discovered:
-                    break
-            if total_selection != self._selection:
-                self._selection = total_selection
-                self._runtime_session.execute(
-                    update(NumPhotos).where(and_(NumPhotos.prefix_path == self._path, NumPhotos.directory == self._name)).values(selected=total_selection.value)
-                )
-                if self._parent is not None:
-                    self._parent._child_changed(total_selection)
+                self._parent._child_changed(total_selection)
+
+    def _get_contents_selection(self):
+        """Combined selection of the albums and photos directly inside this directory
+
+        Uses the lowest and highest selection in each table rather than visiting every item
+        """
+        albums_min, albums_max = self._runtime_session.execute(
+            select(func.min(NumPhotos.selected), func.max(NumPhotos.selected)).where(and_(NumPhotos.prefix_path == self._full_path, NumPhotos.directory != None))
+        ).one()
+        photos_min, photos_max = self._persistent_session.execute(
+            select(func.min(PhotoListV1.selected), func.max(PhotoListV1.selected)).where(PhotoListV1.path == ("" if self._full_path is None else self._full_path))
+        ).one()
+
+        selection = None
+        if albums_min is not None:
+            selection = _MERGED_SELECTION[albums_min][albums_max]
+        if photos_min is not None:
+            # Photos are selected or not, equivalent to all or not
+            photos_selection = _MERGED_SELECTION[PhotoDirectorySelection.All.value * photos_min][PhotoDirectorySelection.All.value * photos_max]
+            selection = photos_selection if selection is None else _MERGED_SELECTION[selection.value][photos_selection.value]
+        if selection is None:
+            raise Exception(f"Directory '{self.name}' is empty")
+        return selection
 
     @property
     def num_pages(self):
         """Number of pages directory takes"""
-        if self._pages is None:
-            self._load_pages()
+        self._check_revision()
+        if self._num_photos is None:
+            self._load_counts()
 
-        return len(self._pages)
+        num_items = self._num_albums + self._num_photos
+        return max(1, -(-num_items // self._num_items_per_page))
 
     def get_page(self, page_number):
         """Get a particular pages info"""
-        if self._pages is None:
-            self._load_pages()
+        self._check_revision()
+        if self._num_photos is None:
+            self._load_counts()
 
+        if page_number not in self._pages:
+            if not 0 <= page_number < self.num_pages:
+                raise IndexError(page_number)
+            self._pages[page_number] = self._load_page(page_number)
         return self._pages[page_number]
 
 class PhotoContainer:
@@ -777,6 +862,7 @@ class PhotoContainer:
         #self._all_photos_selected = False
         self._total_num_photos = 0
         self._total_num_albums = 0
+        self._num_selected_photos = 0 # Ordering is only rebuilt by reorder, so count it there
         self.rescan(shuffle=shuffle)
 
     def rescan(self, shuffle=False):
@@ -791,104 +877,91 @@ class PhotoContainer:
         with PERSISTENT_SESSION() as persistent_session, RUNTIME_SESSION() as runtime_session:
             # Delete num photos list, will rebuild while rescanning
             runtime_session.execute(delete(NumPhotos))
-            runtime_session.commit()
 
-            existing_photos = persistent_session.execute(
-                select(PhotoListV1.id, PhotoListV1.path, PhotoListV1.filename)
-            )
-            for row in existing_photos:
-                runtime_session.add(ExistingFiles(photolist_id=row[0], photo_path=os.path.join(*row[1:]), found=False))
-
-            PHOTOS_PATH = pathlib.Path(os.path.join(params.FILES_LOCATION, params.PHOTOS_LOCATION))
+            # Photos are removed from this as they're found, any left over have been lost
+            existing_photos = {
+                (path, filename): (photolist_id, selected)
+                for photolist_id, path, filename, selected in persistent_session.execute(
+                    select(PhotoListV1.id, PhotoListV1.path, PhotoListV1.filename, PhotoListV1.selected).execution_options(yield_per=_STREAM_BATCH_SIZE)
+                )
+            }
 
-            def scan_directory(directory : Optional[pathlib.Path]):
-                directory_relative_path = "." if directory is None else directory
+            PHOTOS_PREFIX = os.path.join(params.FILES_LOCATION, params.PHOTOS_LOCATION, "")
+            PHOTOS_PREFIX_LENGTH = len(PHOTOS_PREFIX)
 
+            def scan_directory(directory_relative_path : str, prefix_path : str, directory_name : str):
                 num_photos = 0
                 num_albums = 0
 
                 directory_selected = None
 
-                for path in PHOTOS_PATH.joinpath(directory_relative_path).iterdir():
-                    relative_path = path.relative_to(PHOTOS_PATH)
-                    if path.is_dir():
-                        logging.debug("Found directory '%s' in '%s'", path.name, relative_path)
-                        found_photos, internal_directory_selected = scan_directory(relative_path)
-                        if found_photos:
-                            num_albums += 1
-                            self._total_num_albums += 1
-
-                            if directory_selected is None:
-                                directory_selected = internal_directory_selected
-                            elif internal_directory_selected == PhotoDirectorySelection.Partial:
-                                directory_selected = internal_directory_selected
-                            elif internal_directory_selected != directory_selected:
-                                # If one selection is all and one is none
-                                directory_selected = PhotoDirectorySelection.Partial
-                    elif path.is_file():
-                        if is_file_image(path):
-                            num_photos += 1
-                            self._total_num_photos += 1
-                            found_image = runtime_session.execute(
-                                update(ExistingFiles).where(ExistingFiles.photo_path == str(relative_path)).values(found=True).returning(ExistingFiles.id)
-                            ).one_or_none()
-                            if found_image is None:
-                                persistent_session.add(PhotoListV1(filename=path.name, path=str(relative_path.parent)))
-                                logging.info("Found new image '%s' in '%s'", path.name, relative_path)
-                                photo_selected = False
-                            else:
-                                logging.info("Rediscovered image '%s' in '%s'", path.name, relative_path)
-                                photo_selected = persistent_session.scalars(
-                                    select(PhotoListV1.selected).where(
-                                        and_(
-                                            PhotoListV1.path == str(relative_path.parent),
-                                            PhotoListV1.filename == str(relative_path.name)
-                                        )
-                                    )
-                                ).one()
+                with os.scandir(PHOTOS_PREFIX + directory_relative_path) as entries:
+                    for entry in entries:
+                        relative_path = entry.path[PHOTOS_PREFIX_LENGTH:]
+                        if entry.is_dir():
+                            logging.debug("Found directory '%s' in '%s'", entry.name, relative_path)
+                            found_photos, internal_directory_selected = scan_directory(relative_path, directory_relative_path or None, entry.name)
+                            if found_photos:
+                                num_albums += 1
+
+                                if directory_selected is None:
+                                    directory_selected = internal_directory_selected
+                                else:
+                                    directory_selected = _MERGED_SELECTION[directory_selected.value][internal_directory_selected.value]
+                        elif entry.is_file():
+                            found_image = existing_photos.pop((directory_relative_path, entry.name), None)
+                            # Known photos were verified when first found, only read new files
+                            if found_image is not None or is_file_image(entry.path):
+                                num_photos += 1
+                                if found_image is None:
+                                    new_photos.append({"filename": entry.name, "path": directory_relative_path})
+                                    logging.info("Found new image '%s' in '%s'", entry.name, relative_path)
+                                    photo_selected = False
+                                else:
+                                    logging.info("Rediscovered image '%s' in '%s'", entry.name, relative_path)
+                                    photo_selected = found_image[1]
 
-                            if directory_selected is None:
-                                if photo_selected:
-                                    directory_selected = PhotoDirectorySelection.All
+                                photo_selection = PhotoDirectorySelection.All if photo_selected else PhotoDirectorySelection.Not
+                                if directory_selected is None:
+                                    directory_selected = photo_selection
                                 else:
-                                    directory_selected = PhotoDirectorySelection.Not
-                            elif directory_selected != PhotoDirectorySelection.Partial:
-                                if directory_selected == PhotoDirectorySelection.All and not photo_selected:
-                                    directory_selected = PhotoDirectorySelection.Partial
-                                elif directory_selected == PhotoDirectorySelection.Not and photo_selected:
-                                    directory_selected = PhotoDirectorySelection.Partial
-                        else:
-                            logging.error("Found unknown file '%s' in '%s'", path.name, relative_path)
+                                    directory_selected = _MERGED_SELECTION[directory_selected.value][photo_selection.value]
+                            else:
+                                logging.error("Found unknown file '%s' in '%s'", entry.name, relative_path)
 
                 if num_photos != 0 or num_albums != 0:
-                    if directory is None:
-                        prefix_path = None
-                        directory_name = None
-                    else:
-                        prefix_path = str(directory.parent) if directory.parent != pathlib.Path(".") else None
-                        directory_name = directory.name
-                    runtime_session.add(NumPhotos(num_photos=num_photos, num_albums=num_albums, directory=directory_name, prefix_path=prefix_path, selected=directory_selected.value))
+                    new_num_photos.append({"num_photos": num_photos, "num_albums": num_albums, "directory": directory_name, "prefix_path": prefix_path, "selected": directory_selected.value})
                     return True, directory_selected
                 return False, None
 
-            self._total_num_photos = 0
-            self._total_num_albums = 0
+            # Rows are collected while scanning and inserted together afterwards
+            new_photos = []
+            new_num_photos = []
 
-            scan_directory(None)
+            scan_directory("", None, None)
 
-            lost_files = runtime_session.execute(
-                select(ExistingFiles.photolist_id, ExistingFiles.photo_path).where(ExistingFiles.found == False)
-            )
-            for photolist_id, filepath in lost_files:
-                logging.warning("Cannot find photo '%s'", filepath)
+            # Totals come from the per-directory rows rather than being counted during the walk
+            self._total_num_photos = sum(row["num_photos"] for row in new_num_photos)
+            self._total_num_albums = sum(row["num_albums"] for row in new_num_photos)
+
+            if new_photos:
+                persistent_session.execute(insert(PhotoListV1), new_photos)
+            if new_num_photos:
+                runtime_session.execute(insert(NumPhotos), new_num_photos)
+
+            lost_ids = []
+            for (path, filename), (photolist_id, _) in existing_photos.items():
+                logging.warning("Cannot find photo '%s'", os.path.join(path, filename))
+                lost_ids.append(photolist_id)
+            for index in range(0, len(lost_ids), _STREAM_BATCH_SIZE):
                 persistent_session.execute(
-                    delete(PhotoListV1).where(PhotoListV1.id == photolist_id)
+                    delete(PhotoListV1).where(PhotoListV1.id.in_(lost_ids[index:index + _STREAM_BATCH_SIZE]))
                 )
 
+            # Single commit per database once the whole scan has completed
             persistent_session.commit()
-
-            runtime_session.execute(delete(ExistingFiles))
             runtime_session.commit()
+            _invalidate_cached_selections()
 
             #result = persistent_session.scalars(
             #    select(func.count(PhotoListV1.id)).where(PhotoListV1.selected == False)
@@ -919,30 +992,28 @@ class PhotoContainer:
         with RUNTIME_SESSION() as runtime_session, PERSISTENT_SESSION() as persistent_session:
             runtime_session.execute(delete(PhotoOrder))
 
-            query = select(PhotoListV1.id).where(PhotoListV1.selected == True)
+            query = select(PhotoListV1.id, PhotoListV1.path, PhotoListV1.filename).where(PhotoListV1.selected == True)
             if shuffle:
-                query.order_by(func.random())
-
-            for row in persistent_session.scalars(query):
-                runtime_session.add(PhotoOrder(photo_id=row))
+                query = query.order_by(func.random())
+
+            new_photo_order = [
+                {"photo_id": photo_id, "path": path, "filename": filename}
+                for photo_id, path, filename in persistent_session.execute(query)
+            ]
+            if new_photo_order:
+                runtime_session.execute(insert(PhotoOrder), new_photo_order)
             runtime_session.commit()
+            self._num_selected_photos = len(new_photo_order)
 
     @property
     def num_selected_photos(self):
         """Get the number of selected photos"""
-        with RUNTIME_SESSION() as session:
-            return session.execute(
-                select(func.count(PhotoOrder.id))
-            ).scalar_one()
+        return self._num_selected_photos
 
     @property
     def photos_selected(self):
         """Return whether any photos are selected"""
-        with RUNTIME_SESSION() as session:
-            result = session.scalars(
-                select(PhotoOrder.id).limit(1)
-            ).one_or_none()
-            return result is not None
+        return self._num_selected_photos != 0
 
     @property
     def all_photos_selected(self):
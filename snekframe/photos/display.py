@@ -1,46 +1,224 @@
 """Photo Display Window"""
 
-from collections import deque
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-import datetime
 from enum import Enum, auto
+import hashlib
 import logging
+import os
 import os.path
+import threading
 import time
-from typing import Callable, Iterable
+from typing import Callable, Iterable, Optional
 
 import tkinter as tk
 from tkinter import ttk
 
-from sqlalchemy.sql.expression import select, update
+from sqlalchemy.sql.expression import select, update, bindparam
 
-from PIL import Image as PIL_Image, ImageTk as PIL_ImageTk, ImageOps as PIL_ImageOps, UnidentifiedImageError
+from PIL import Image as PIL_Image, ImageTk as PIL_ImageTk, ExifTags as PIL_ExifTags, UnidentifiedImageError
 
 from .. import elements, settings
-from ..db import RUNTIME_SESSION, PERSISTENT_SESSION, PhotoListV1
+from ..db import RUNTIME_SESSION
 from ..db.runtime import PhotoOrder
-from ..params import WINDOW_HEIGHT, WINDOW_WIDTH, FILES_LOCATION, PHOTOS_LOCATION
-
-def _get_resized_image_dimensions(image, max_width=WINDOW_WIDTH, max_height=WINDOW_HEIGHT):
-    scale_x = max_width / image.width
-    scale_y = max_height / image.height
-
-    if scale_x < scale_y:
-        return image.width * scale_x, image.height * scale_y
-    return image.width * scale_y, image.height * scale_y
-
-def _resize_image(image, max_width=WINDOW_WIDTH, max_height=WINDOW_HEIGHT):
-    PIL_ImageOps.exif_transpose(image, in_place=True)
-    size_x, size_y = _get_resized_image_dimensions(image, max_width=max_width, max_height=max_height)
-    return image.resize((int(size_x), int(size_y)), PIL_Image.LANCZOS)
-
-@dataclass
+from ..params import WINDOW_HEIGHT, WINDOW_WIDTH, FILES_LOCATION, PHOTOS_LOCATION, RESIZED_CACHE_LOCATION
+
+# Transpose to show a photo the right way up for each EXIF orientation (1 is already upright)
+_EXIF_ORIENTATION_TRANSPOSE = {
+    2: PIL_Image.Transpose.FLIP_LEFT_RIGHT,
+    3: PIL_Image.Transpose.ROTATE_180,
+    4: PIL_Image.Transpose.FLIP_TOP_BOTTOM,
+    5: PIL_Image.Transpose.TRANSPOSE,
+    6: PIL_Image.Transpose.ROTATE_270,
+    7: PIL_Image.Transpose.TRANSVERSE,
+    8: PIL_Image.Transpose.ROTATE_90,
+}
+# Orientations where the stored width is the displayed height
+_EXIF_ORIENTATION_SWAPS_AXES = frozenset((5, 6, 7, 8))
+
+def _get_resized_image_dimensions(width, height, max_width=WINDOW_WIDTH, max_height=WINDOW_HEIGHT):
+    scale = min(max_width / width, max_height / height)
+    return int(width * scale), int(height * scale)
+
+def _resize_image(image, max_width=WINDOW_WIDTH, max_height=WINDOW_HEIGHT, resample=PIL_Image.BICUBIC):
+    # Resize as stored and only transpose the smaller result, rather than transposing the full size image
+    orientation = image.getexif().get(PIL_ExifTags.Base.Orientation, 1)
+    if orientation in _EXIF_ORIENTATION_SWAPS_AXES:
+        max_width, max_height = max_height, max_width
+
+    # Let JPEGs decode at a reduced scale (no-op for other formats), must be before the image loads
+    image.draft(image.mode, (max_width, max_height))
+    size_x, size_y = _get_resized_image_dimensions(image.width, image.height, max_width=max_width, max_height=max_height)
+    # Reduce large images by an integer factor first (cheap box filter) so the filtered resize has less to do
+    # A gap of 3 is practically indistinguishable from resizing in one step
+    image = image.resize((size_x, size_y), resample, reducing_gap=3.0)
+
+    transpose_method = _EXIF_ORIENTATION_TRANSPOSE.get(orientation)
+    if transpose_method is not None:
+        image = image.transpose(transpose_method)
+    return image
+
+# Photos resized for the display and gallery are kept on disk so they don't need decoding and resizing again
+# Stored losslessly so a cached photo looks the same as the first time it was shown, up to around 2 MB each
+_RESIZED_CACHE_PATH = os.path.join(FILES_LOCATION, RESIZED_CACHE_LOCATION)
+_RESIZED_CACHE_MAX_BYTES = 256 * 1024 * 1024
+_RESIZED_CACHE_EXTENSION = ".png"
+_RESIZED_CACHE_COMPRESS_LEVEL = 1 # Fastest, harder compression takes several times longer for little saving
+
+def _get_resized_cache_path(photo_path, resample, max_width, max_height):
+    """Cache file for a resized photo, changes if the photo is modified"""
+    photo_key = hashlib.sha1(photo_path.encode()).hexdigest()
+    modified_time = os.stat(photo_path).st_mtime_ns
+    return os.path.join(_RESIZED_CACHE_PATH, f"{photo_key}_{modified_time}_{max_width}x{max_height}_{int(resample)}{_RESIZED_CACHE_EXTENSION}")
+
+# Size of each cache file by when it was last used, least recent first
+# Read from the directory once then kept in memory, so reading an entry doesn't write to the disk
+_resized_cache_lock = threading.Lock() # Used by the slideshow, gallery and cache writer threads
+_resized_cache_files : Optional[OrderedDict[str, int]] = None
+_resized_cache_bytes = 0
+
+# Entries are written on their own thread so a photo can be shown without waiting for it to be saved
+_resized_cache_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ResizedCacheWriter")
+
+def _get_resized_cache_files():
+    """Cache files in order of use, read from the directory the first time, must hold the lock"""
+    global _resized_cache_files, _resized_cache_bytes # pylint: disable=global-statement
+    if _resized_cache_files is None:
+        cached_files = []
+        try:
+            with os.scandir(_RESIZED_CACHE_PATH) as entries:
+                for entry in entries:
+                    try:
+                        if entry.name.endswith(_RESIZED_CACHE_EXTENSION):
+                            # Entries aren't modified after being written, last use isn't known so go by age
+                            entry_stat = entry.stat()
+                            cached_files.append((entry_stat.st_mtime_ns, entry.path, entry_stat.st_size))
+                        else:
+                            # Interrupted write or older cache format
+                            os.remove(entry.path)
+                    except FileNotFoundError:
+                        pass
+        except FileNotFoundError:
+            pass
+        cached_files.sort()
+        _resized_cache_files = OrderedDict((cached_path, size) for _, cached_path, size in cached_files)
+        _resized_cache_bytes = sum(size for _, _, size in cached_files)
+        _prune_resized_cache()
+    return _resized_cache_files
+
+def _prune_resized_cache():
+    """Remove the least recently used resized photos once they take too much space, must hold the lock"""
+    global _resized_cache_bytes # pylint: disable=global-statement
+    while _resized_cache_bytes > _RESIZED_CACHE_MAX_BYTES:
+        cached_path, size = _resized_cache_files.popitem(last=False)
+        _resized_cache_bytes -= size
+        try:
+            os.remove(cached_path)
+        except FileNotFoundError:
+            pass
+
+def _forget_resized_cache_file(cache_path):
+    """Stop listing a cache file that can no longer be read"""
+    global _resized_cache_bytes # pylint: disable=global-statement
+    with _resized_cache_lock:
+        _resized_cache_bytes -= _get_resized_cache_files().pop(cache_path, 0)
+
+def _save_resized_cache_file(image, cache_path):
+    """Write a resized photo to the cache, run on the cache writer thread"""
+    global _resized_cache_bytes # pylint: disable=global-statement
+    with _resized_cache_lock:
+        if cache_path in _get_resized_cache_files():
+            return # Saved for an earlier request
+
+    try:
+        os.makedirs(_RESIZED_CACHE_PATH, exist_ok=True)
+        # Written under a temporary name so a partial file is never read
+        temporary_path = f"{cache_path}.tmp"
+        image.save(temporary_path, "PNG", compress_level=_RESIZED_CACHE_COMPRESS_LEVEL)
+        os.replace(temporary_path, cache_path)
+        size = os.path.getsize(cache_path)
+    except OSError as err:
+        logging.warning("Unable to cache resized photo '%s': %s", cache_path, err)
+        return
+
+    with _resized_cache_lock:
+        _get_resized_cache_files()[cache_path] = size
+        _resized_cache_bytes += size
+        _prune_resized_cache()
+
+def _load_resized_image(photo_path, resample=PIL_Image.BICUBIC, max_width=WINDOW_WIDTH, max_height=WINDOW_HEIGHT):
+    """Open and resize a photo, None if it can't be opened
+
+    Safe to run off the main thread, the Tk image must still be created on it
+    """
+    try:
+        cache_path = _get_resized_cache_path(photo_path, resample, max_width, max_height)
+    except FileNotFoundError:
+        logging.warning("Cannot find photo '%s'", photo_path)
+        return None
+
+    with _resized_cache_lock:
+        cached_files = _get_resized_cache_files()
+        cached = cache_path in cached_files
+        if cached:
+            cached_files.move_to_end(cache_path)
+    if cached:
+        try:
+            cached_image = PIL_Image.open(cache_path)
+            cached_image.load()
+        except OSError:
+            _forget_resized_cache_file(cache_path)
+        else:
+            return cached_image
+
+    try:
+        # Resizing returns a new image, so the original file can be closed straight away
+        with PIL_Image.open(photo_path) as original_image:
+            new_image = _resize_image(original_image, max_width=max_width, max_height=max_height, resample=resample)
+    except FileNotFoundError:
+        logging.warning("Cannot find photo '%s'", photo_path)
+        return None
+    except UnidentifiedImageError:
+        logging.warning("Unable to open file '%s'", photo_path)
+        return None
+    except OSError as err:
+        # Truncated or corrupt image data only shows up when decoding
+        logging.warning("Unable to load photo '%s': %s", photo_path, err)
+        return None
+
+    # Only read from here on, so it can be saved while it is shown
+    _resized_cache_writer.submit(_save_resized_cache_file, new_image, cache_path)
+    return new_image
+
+# Statements to step through the ordering, built once and given the current position when executed
+_VALID_IMAGES_QUERY = select(PhotoOrder.id, PhotoOrder.photo_id, PhotoOrder.path, PhotoOrder.filename).where(PhotoOrder.lost == False)
+_FIRST_IMAGE_STATEMENT = _VALID_IMAGES_QUERY.limit(1)
+_NEXT_IMAGE_STATEMENT = _VALID_IMAGES_QUERY.where(PhotoOrder.id > bindparam("ordering_id")).limit(1)
+_LAST_IMAGE_STATEMENT = _VALID_IMAGES_QUERY.order_by(PhotoOrder.id.desc()).limit(1)
+_PREVIOUS_IMAGE_STATEMENT = _VALID_IMAGES_QUERY.where(PhotoOrder.id < bindparam("ordering_id")).order_by(PhotoOrder.id.desc()).limit(1)
+
+# Clicks further than the margin either side of the centre change photo, closer ones open the menu
+_WINDOW_CENTRE_X = WINDOW_WIDTH // 2
+_NAVIGATION_CLICK_MARGIN = 50
+_REVERSE_CLICK_MAX_X = _WINDOW_CENTRE_X - _NAVIGATION_CLICK_MARGIN
+_FORWARD_CLICK_MIN_X = _WINDOW_CENTRE_X + _NAVIGATION_CLICK_MARGIN
+
+@dataclass(slots=True)
 class _ImageIdPair:
     ordering_id : int
     photo_id : int
+    photo_path : str
+
+    @classmethod
+    def from_row(cls, row):
+        """From a photo ordering row with path and filename"""
+        return cls(ordering_id=row.id, photo_id=row.photo_id, photo_path=os.path.join(FILES_LOCATION, PHOTOS_LOCATION, row.path, row.filename))
 
 class PhotoDisplayWindow(elements.LimitedFrameBaseElement):
     _NUM_PHOTOS_LOADED = 3
+    _LOADING_IMAGE_POLL_MS = 50
+    _NUM_RECENT_PHOTOS = 4 # Kept after dropping out of the loaded images, for going back and forth
 
     # TODO: Keep title open if clicking on it
 
@@ -59,13 +237,13 @@ class PhotoDisplayWindow(elements.LimitedFrameBaseElement):
         self._disable_slideshow = disable_slideshow
 
         self._photo = None
+        self._photo_click_offset = None # From photo to window x coordinates, None until the next click
 
         self._image_ids : deque[_ImageIdPair] = deque(maxlen=3)
         self._loaded_images : deque[PIL_ImageTk.PhotoImage] = deque(maxlen=3)
 
         self._photo_change_job = None
-        self._last_action_time = datetime.datetime.now()
-        self._last_transition_time = datetime.datetime.now()
+        self._last_action_time = self._last_transition_time = time.monotonic_ns()
         self._action = None
         self._action_job = None
         self._action_timer = None
@@ -74,13 +252,22 @@ class PhotoDisplayWindow(elements.LimitedFrameBaseElement):
 
         self._title_showing = False
 
+        # Next image is decoded in the background while the current one is shown
+        self._image_loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PhotoLoader")
+        self._loading_image = None # (forward, _ImageIdPair, Future) being loaded
+        self._loading_image_job = None
+
+        self._recent_images : OrderedDict[int, PIL_ImageTk.PhotoImage] = OrderedDict() # By ordering id
+
         self.regenerate_window()
 
     def place(self, **place_kwargs):
-        if len(self._loaded_images) > 1:
+        if self._loading_image is not None:
+            # Picks up the background load that stopped being checked while hidden
+            self._finish_loading_image(wait=False)
+        if len(self._loaded_images) > 1 or self._loading_image is not None:
             self._photo_change_job = self._frame.after(10000, self._transition_next_photo)
-        self._last_action_time = datetime.datetime.now()
-        self._last_transition_time = datetime.datetime.now()
+        self._last_action_time = self._last_transition_time = time.monotonic_ns()
         self._title_showing = False
         super().place(**place_kwargs)
 
@@ -88,312 +275,257 @@ class PhotoDisplayWindow(elements.LimitedFrameBaseElement):
         if self._photo_change_job is not None:
             self._frame.after_cancel(self._photo_change_job)
             self._photo_change_job = None
+        if self._loading_image_job is not None:
+            self._frame.after_cancel(self._loading_image_job)
+            self._loading_image_job = None
         self._title_showing = False
         super().place_forget()
 
+    def close_window(self):
+        """Hide the window for the last time, stopping its background loading"""
+        self.place_forget()
+        for job in (self._action_job, self._remove_title_job):
+            if job is not None:
+                self._frame.after_cancel(job)
+        self._action_job = self._remove_title_job = None
+        self._loading_image = None
+        self._image_loader.shutdown(wait=False, cancel_futures=True)
+
     def regenerate_window(self):
         # Can just rearrange
         if self._photo is not None:
             self._photo.destroy()
 
-        self._last_action_time = datetime.datetime.now()
-        self._last_transition_time = datetime.datetime.now()
+        self._last_action_time = self._last_transition_time = time.monotonic_ns()
 
         self._title_showing = False
 
         self._photo = ttk.Label(self._frame, text="Error: Photos unable to load. Try rescan.", style="Image.DisplayWindow.TLabel")
         self._photo.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
+        self._photo_click_offset = None
+
+        # Discard any image still loading for the old ordering
+        if self._loading_image_job is not None:
+            self._frame.after_cancel(self._loading_image_job)
+            self._loading_image_job = None
+        self._loading_image = None
 
         self._image_ids.clear()
         self._loaded_images.clear()
+        self._recent_images.clear()
 
-        discovered_photos = 0
-        loaded_all_photos = True
-        last_image_ordering_id = None
-        image_query = select(PhotoOrder).where(PhotoOrder.lost == False)
+        # Only the shown image is loaded here, the ones either side are loaded in the background
+        lost_ordering_ids = []
 
         with RUNTIME_SESSION() as session:
-            while len(self._loaded_images) < 3:
-                new_image_query = image_query if last_image_ordering_id is None else image_query.where(PhotoOrder.id > last_image_ordering_id)
-                new_image_row = session.scalars(
-                    new_image_query.limit(1)
-                ).one_or_none()
-
-                if new_image_row is None:
+            new_image_row = session.execute(_FIRST_IMAGE_STATEMENT).one_or_none()
+            while new_image_row is not None:
+                new_image_id = _ImageIdPair.from_row(new_image_row)
+                new_image = _load_resized_image(new_image_id.photo_path, resample=self._settings.photo_resample_filter)
+                if new_image is not None:
+                    self._image_ids.append(new_image_id)
+                    self._loaded_images.append(PIL_ImageTk.PhotoImage(new_image))
                     break
+                lost_ordering_ids.append(new_image_id.ordering_id)
+                new_image_row = session.execute(
+                    _NEXT_IMAGE_STATEMENT, {"ordering_id": new_image_id.ordering_id}
+                ).one_or_none()
 
-                last_image_ordering_id = new_image_row.id
-                new_image_id = _ImageIdPair(ordering_id=new_image_row.id, photo_id=new_image_row.photo_id)
-                photo_path = self._get_photo_paths(new_image_id)[0]
-                try:
-                    new_image = PIL_Image.open(photo_path)
-                except FileNotFoundError:
-                    logging.warning("Cannot find photo '%s'", photo_path)
-                except UnidentifiedImageError:
-                    logging.warning("Unable to open file '%s'", photo_path)
-                else:
-                    self._image_ids.append(new_image_id)
-                    self._loaded_images.append(
-                        PIL_ImageTk.PhotoImage(
-                            _resize_image(
-                                new_image
-                            )
-                        )
-                    )
-                    continue
-                loaded_all_photos = False
+            if lost_ordering_ids:
                 session.execute(
-                    update(PhotoOrder).where(PhotoOrder.id == new_image_id.ordering_id).values(lost=True)
+                    update(PhotoOrder).where(PhotoOrder.id.in_(lost_ordering_ids)).values(lost=True)
                 )
-            if not loaded_all_photos:
                 session.commit()
 
+            if len(self._loaded_images) > 0:
+                self._load_missing_image(session)
+
         if len(self._loaded_images) > 0:
-            if len(self._loaded_images) > 1:
-                main_image = self._loaded_images[1]
-            else:
-                main_image = self._loaded_images[0]
-            self._photo.configure(image=main_image)
-            self._photo.image = main_image
+            self._show_image(self._loaded_images[0])
+            self._finish_loading_image(wait=False)
         else:
             self._disable_slideshow()
 
         self._frame.bind("<Button-1>", self._frame_detect_click)
-        self._frame.bind("<ButtonRelease-1>", self._frame_detect_release)
+        self._frame.bind("<ButtonRelease-1>", self._detect_release)
         self._photo.bind("<Button-1>", self._photo_detect_click)
-        self._photo.bind("<ButtonRelease-1>", self._photo_detect_release)
-
-    def _get_photo_paths(self, *ids : _ImageIdPair):
-        results = []
-        with PERSISTENT_SESSION() as session:
-            for id_set in ids:
-                result = session.execute(
-                    select(PhotoListV1.filename, PhotoListV1.path).where(PhotoListV1.id == id_set.photo_id)
-                ).one()
-                results.append(os.path.join(FILES_LOCATION, PHOTOS_LOCATION, result[1], result[0]))
-        return results
-
-
-    def _frame_detect_click(self, event):
-        if len(self._image_ids) <= 1:
-            return self._menu_click(event)
-
-        if event.x < ((WINDOW_WIDTH / 2) - 50):
-            return self._reverse_image_click(event)
-        elif event.x > ((WINDOW_WIDTH / 2) + 50):
-            return self._forward_image_click(event)
-        else:
-            return self._menu_click(event)
+        self._photo.bind("<ButtonRelease-1>", self._detect_release)
 
-    def _frame_detect_release(self, event):
+    def _get_click_action(self, x):
+        """Action for a click at x in window coordinates"""
         if len(self._image_ids) <= 1:
-            return self._menu_release(event)
+            return self._ActionType.Menu
+        if x < _REVERSE_CLICK_MAX_X:
+            return self._ActionType.Reverse
+        if x > _FORWARD_CLICK_MIN_X:
+            return self._ActionType.Forward
+        return self._ActionType.Menu
 
-        if event.x < ((WINDOW_WIDTH / 2) - 50):
-            return self._reverse_image_release(event)
-        elif event.x > ((WINDOW_WIDTH / 2) + 50):
-            return self._forward_image_release(event)
-        else:
-            return self._menu_release(event)
+    def _frame_detect_click(self, event):
+        self._action_click(self._get_click_action(event.x))
 
     def _photo_detect_click(self, event):
-        if len(self._image_ids) <= 1:
-            return self._menu_click(event)
-
-        x = event.x - (self._photo.winfo_reqwidth() / 2) + (WINDOW_WIDTH / 2)
-
-        if x < ((WINDOW_WIDTH / 2) - 50):
-            return self._reverse_image_click(event)
-        elif x > ((WINDOW_WIDTH / 2) + 50):
-            return self._forward_image_click(event)
+        self._action_click(self._get_click_action(self._get_photo_click_x(event)))
+
+    def _detect_release(self, event):
+        self._last_action_time = time.monotonic_ns()
+
+    def _get_photo_click_x(self, event):
+        """Position of a click on the photo in window coordinates"""
+        if self._photo_click_offset is None:
+            # Photo is centred, its size only changes with the image shown
+            self._photo_click_offset = _WINDOW_CENTRE_X - (self._photo.winfo_reqwidth() // 2)
+        return event.x + self._photo_click_offset
+
+    def _show_image(self, image):
+        self._photo.configure(image=image)
+        self._photo.image = image
+        self._photo_click_offset = None
+
+    def _remember_image(self, index):
+        """Keep the loaded image at index, which is about to be dropped, in case it's shown again soon"""
+        if len(self._loaded_images) == self._loaded_images.maxlen:
+            self._recent_images[self._image_ids[index].ordering_id] = self._loaded_images[index]
+            if len(self._recent_images) > self._NUM_RECENT_PHOTOS:
+                self._recent_images.popitem(last=False)
+
+    def _append_image(self, new_image_id, new_image):
+        self._remember_image(0)
+        self._image_ids.append(new_image_id)
+        self._loaded_images.append(new_image)
+
+    def _appendleft_image(self, new_image_id, new_image):
+        self._remember_image(-1)
+        self._image_ids.appendleft(new_image_id)
+        self._loaded_images.appendleft(new_image)
+
+    def _add_image(self, forward : bool, new_image_id, new_image):
+        if forward:
+            self._append_image(new_image_id, new_image)
         else:
-            return self._menu_click(event)
-
-    def _photo_detect_release(self, event):
-        if len(self._image_ids) <= 1:
-            return self._menu_release(event)
-
-        x = event.x - (self._photo.winfo_reqwidth() / 2) + (WINDOW_WIDTH / 2)
-
-        if x < ((WINDOW_WIDTH / 2) - 50):
-            return self._reverse_image_release(event)
-        elif x > ((WINDOW_WIDTH / 2) + 50):
-            return self._forward_image_release(event)
+            self._appendleft_image(new_image_id, new_image)
+
+    def _find_image(self, session, forward : bool, last_image_ordering_id):
+        """Next photo in the ordering in either direction, wrapping round at the ends
+
+        None if that would reach the images already loaded
+        """
+        if forward:
+            new_image_row = session.execute(
+                _NEXT_IMAGE_STATEMENT, {"ordering_id": last_image_ordering_id}
+            ).one_or_none()
+            if new_image_row is None:
+                new_image_row = session.execute(_FIRST_IMAGE_STATEMENT).one_or_none()
+            loaded_end_id = self._image_ids[0]
         else:
-            return self._menu_release(event)
-
-    def _get_forward_image(self):
-        image_query = select(PhotoOrder).where(PhotoOrder.lost == False)
-        last_image_ordering_id = self._image_ids[-1].ordering_id
-        with RUNTIME_SESSION() as session:
-            while True:
-                if last_image_ordering_id is None:
-                    new_image_query = image_query
-                else:
-                    new_image_query = image_query.where(PhotoOrder.id > last_image_ordering_id)
-
-                new_image_row = session.scalars(
-                    new_image_query.limit(1)
-                ).one_or_none()
-
-                if new_image_row is None:
-                    if last_image_ordering_id is None:
-                        break
-                    else:
-                        last_image_ordering_id = None
-                else:
-                    if new_image_row.id == self._image_ids[0].ordering_id:
-                        break
-                    last_image_ordering_id = new_image_row.id
-                    new_image_id = _ImageIdPair(ordering_id=new_image_row.id, photo_id=new_image_row.photo_id)
-                    photo_path = self._get_photo_paths(new_image_id)[0]
-                    try:
-                        new_image = PIL_Image.open(photo_path)
-                    except FileNotFoundError:
-                        logging.warning("Cannot find photo '%s'", photo_path)
-                    except UnidentifiedImageError:
-                        logging.warning("Unable to open file '%s'", photo_path)
-                    else:
-                        self._image_ids.append(new_image_id)
-                        self._loaded_images.append(
-                            PIL_ImageTk.PhotoImage(
-                                _resize_image(
-                                    new_image
-                                )
-                            )
-                        )
-                        return
-                    session.execute(
-                        update(PhotoOrder).where(PhotoOrder.id == new_image_id.ordering_id).values(lost=True)
-                    )
-                    session.commit()
-
-        self._loaded_images.append(self._loaded_images.popleft())
-        self._image_ids.append(self._image_ids.popleft())
+            new_image_row = session.execute(
+                _PREVIOUS_IMAGE_STATEMENT, {"ordering_id": last_image_ordering_id}
+            ).one_or_none()
+            if new_image_row is None:
+                new_image_row = session.execute(_LAST_IMAGE_STATEMENT).one_or_none()
+            loaded_end_id = self._image_ids[-1]
+
+        if new_image_row is None or new_image_row.id == loaded_end_id.ordering_id:
+            return None
+        return _ImageIdPair.from_row(new_image_row)
+
+    def _load_missing_image(self, session):
+        """Start loading the image before the shown one, then the one after, until all are loaded"""
+        if len(self._loaded_images) == 1:
+            self._load_image(False, self._find_image(session, False, self._image_ids[0].ordering_id))
+        elif len(self._loaded_images) == 2:
+            self._load_image(True, self._find_image(session, True, self._image_ids[-1].ordering_id))
+
+    def _load_image(self, forward : bool, new_image_id):
+        """Start loading the given image in the background, to go after (forward) or before the loaded images"""
+        if new_image_id is None:
+            if len(self._loaded_images) < self._NUM_PHOTOS_LOADED:
+                # Fewer photos than are kept loaded, all of them already are
+                return
+            # No other photos, cycle round the loaded ones
+            if forward:
+                self._loaded_images.append(self._loaded_images.popleft())
+                self._image_ids.append(self._image_ids.popleft())
+            else:
+                self._loaded_images.appendleft(self._loaded_images.pop())
+                self._image_ids.appendleft(self._image_ids.pop())
+            return
 
-    def _get_reverse_image(self):
-        image_query = select(PhotoOrder).where(PhotoOrder.lost == False)
-        last_image_ordering_id = self._image_ids[0].ordering_id
-        with RUNTIME_SESSION() as session:
-            while True:
-                if last_image_ordering_id is None:
-                    new_image_query = image_query
-                else:
-                    new_image_query = image_query.where(PhotoOrder.id < last_image_ordering_id)
-
-                new_image_row = session.scalars(
-                    new_image_query.order_by(PhotoOrder.id.desc()).limit(1)
-                ).one_or_none()
+        recent_image = self._recent_images.pop(new_image_id.ordering_id, None)
+        if recent_image is not None:
+            self._add_image(forward, new_image_id, recent_image)
+            return
 
-                if new_image_row is None:
-                    if last_image_ordering_id is None:
-                        break
-                    else:
-                        last_image_ordering_id = None
-                else:
-                    if new_image_row.id == self._image_ids[-1].ordering_id:
-                        break
-                    last_image_ordering_id = new_image_row.id
-                    new_image_id = _ImageIdPair(ordering_id=new_image_row.id, photo_id=new_image_row.photo_id)
-                    photo_path = self._get_photo_paths(new_image_id)[0]
-                    try:
-                        new_image = PIL_Image.open(photo_path)
-                    except FileNotFoundError:
-                        logging.warning("Cannot find photo '%s'", photo_path)
-                    except UnidentifiedImageError:
-                        logging.warning("Unable to open file '%s'", photo_path)
-                    else:
-                        self._image_ids.appendleft(new_image_id)
-                        self._loaded_images.appendleft(
-                            PIL_ImageTk.PhotoImage(
-                                _resize_image(
-                                    new_image
-                                )
-                            )
-                        )
-                        return
-                    session.execute(
-                        update(PhotoOrder).where(PhotoOrder.id == new_image_id.ordering_id).values(lost=True)
-                    )
-                    session.commit()
-
-        self._loaded_images.appendleft(self._loaded_images.pop())
-        self._image_ids.appendleft(self._image_ids.pop())
+        self._loading_image = (
+            forward,
+            new_image_id,
+            self._image_loader.submit(_load_resized_image, new_image_id.photo_path, resample=self._settings.photo_resample_filter)
+        )
+
+    def _check_loading_image(self):
+        self._loading_image_job = None
+        self._finish_loading_image(wait=False)
+
+    def _finish_loading_image(self, wait : bool):
+        """Add the image loaded in the background to the loaded images
+
+        If it isn't ready and not waiting, check again later
+        """
+        if self._loading_image_job is not None:
+            self._frame.after_cancel(self._loading_image_job)
+            self._loading_image_job = None
+
+        while self._loading_image is not None:
+            forward, new_image_id, future = self._loading_image
+            if not wait and not future.done():
+                self._loading_image_job = self._frame.after(self._LOADING_IMAGE_POLL_MS, self._check_loading_image)
+                return
+            self._loading_image = None
+
+            new_image = future.result()
+            if new_image is not None:
+                self._add_image(forward, new_image_id, PIL_ImageTk.PhotoImage(new_image))
+                if len(self._loaded_images) < self._NUM_PHOTOS_LOADED:
+                    # Still filling in either side of the shown image after regenerating
+                    with RUNTIME_SESSION() as session:
+                        self._load_missing_image(session)
+                continue
+
+            with RUNTIME_SESSION() as session:
+                session.execute(
+                    update(PhotoOrder).where(PhotoOrder.id == new_image_id.ordering_id).values(lost=True)
+                )
+                session.commit()
+                next_image_id = self._find_image(session, forward, new_image_id.ordering_id)
+            self._load_image(forward, next_image_id)
 
     class _ActionType(Enum):
         Reverse = auto()
         Forward = auto()
         Menu = auto()
 
-    def _reverse_image_click(self, event):
-        if self._action_job is not None:
-            self._frame.after_cancel(self._action_job)
-            self._action_job = None
-
-        if self._action is None:
-            self._action_timer = time.time_ns()
-            self._action = self._ActionType.Reverse
-            self._action_job = self._frame.after(500, self._try_complete_action)
-        elif self._action == self._ActionType.Reverse:
-            if (time.time_ns() - self._action_timer) <= 500000000:
-                if len(self._loaded_images) < 3:
-                    self._switch_images()
-                else:
-                    self._switch_reverse_image()
-            self._action_timer = None
-            self._action = None
-        else:
-            self._action = None
-            self._action_timer = None
+    def _action_click(self, action):
+        current_time = time.monotonic_ns()
 
-        self._last_action_time = datetime.datetime.now()
-
-    def _reverse_image_release(self, event):
-        self._last_action_time = datetime.datetime.now()
-
-    def _forward_image_click(self, event):
         if self._action_job is not None:
             self._frame.after_cancel(self._action_job)
             self._action_job = None
 
         if self._action is None:
-            self._action_timer = time.time_ns()
-            self._action = self._ActionType.Forward
+            self._action_timer = current_time
+            self._action = action
             self._action_job = self._frame.after(500, self._try_complete_action)
-        elif self._action == self._ActionType.Forward:
-            if (time.time_ns() - self._action_timer) <= 500000000:
-                if len(self._loaded_images) < 3:
-                    self._switch_images()
-                else:
-                    self._switch_forward_image()
+        elif self._action == action and action != self._ActionType.Menu:
+            # Double tap either side changes photo
+            if (current_time - self._action_timer) <= 500000000:
+                self._switch_image(forward=action == self._ActionType.Forward)
             self._action_timer = None
             self._action = None
         else:
             self._action = None
             self._action_timer = None
 
-        self._last_action_time = datetime.datetime.now()
-
-    def _forward_image_release(self, event):
-        self._last_action_time = datetime.datetime.now()
-
-    def _menu_click(self, event):
-        if self._action_job is not None:
-            self._frame.after_cancel(self._action_job)
-            self._action_job = None
-
-        if self._action is None:
-            self._action_timer = time.time_ns()
-            self._action = self._ActionType.Menu
-            self._action_job = self._frame.after(500, self._try_complete_action)
-        else:
-            self._action = None
-            self._action_timer = None
-
-        self._last_action_time = datetime.datetime.now()
-
-    def _menu_release(self, event):
-        self._last_action_time = datetime.datetime.now()
+        self._last_action_time = current_time
 
     def _try_complete_action(self):
         if self._action is None:
@@ -414,44 +546,50 @@ class PhotoDisplayWindow(elements.LimitedFrameBaseElement):
         self._action_job = None
 
     def _switch_images(self):
+        self._finish_loading_image(wait=True)
         if len(self._loaded_images) != 2:
             raise Exception() # TODO: Better error message
 
         self._loaded_images.append(self._loaded_images.popleft())
         self._image_ids.append(self._image_ids.popleft())
 
-        self._photo.configure(image=self._loaded_images[1])
-        self._photo.image = self._loaded_images[1]
+        self._show_image(self._loaded_images[1])
 
-    def _switch_forward_image(self):
-        self._get_forward_image()
-        self._photo.configure(image=self._loaded_images[1])
-        self._photo.image = self._loaded_images[1]
+    def _switch_image(self, forward : bool):
+        self._finish_loading_image(wait=True)
+        if len(self._loaded_images) <= 1:
+            return
+        if len(self._loaded_images) < 3:
+            self._switch_images()
+            return
+        # Already loaded, so show it straight away and load the one past it in the background
+        next_image = self._loaded_images[2] if forward else self._loaded_images[0]
+        self._show_image(next_image)
+        last_image_id = self._image_ids[-1] if forward else self._image_ids[0]
+        with RUNTIME_SESSION() as session:
+            new_image_id = self._find_image(session, forward, last_image_id.ordering_id)
+        self._load_image(forward, new_image_id)
+        self._finish_loading_image(wait=False)
 
-    def _switch_reverse_image(self):
-        self._get_reverse_image()
-        self._photo.configure(image=self._loaded_images[1])
-        self._photo.image = self._loaded_images[1]
+    def _switch_forward_image(self):
+        self._switch_image(forward=True)
 
     def _transition_next_photo(self):
-        current_time = datetime.datetime.now()
+        current_time = time.monotonic_ns()
 
-        timedelta = current_time - self._last_transition_time
-        if timedelta < self._settings.photo_change_time:
-            trigger_after_secs = self._settings.photo_change_time - timedelta
-            self._photo_change_job = self._frame.after(int(trigger_after_secs.total_seconds() * 1000), self._transition_next_photo)
+        time_since_transition = current_time - self._last_transition_time
+        if time_since_transition < self._settings.photo_change_time_ns:
+            self._photo_change_job = self._frame.after((self._settings.photo_change_time_ns - time_since_transition) // 1000000, self._transition_next_photo)
             return
 
-        timedelta = current_time - self._last_action_time
-        if timedelta < datetime.timedelta(seconds=10):
-            seconds_since_event = timedelta.total_seconds()
-            if seconds_since_event < 9.0:
-                self._photo_change_job = self._frame.after(int((10-seconds_since_event)*1000), self._transition_next_photo)
-                return
+        time_since_action = current_time - self._last_action_time
+        if time_since_action < 9000000000:
+            self._photo_change_job = self._frame.after((10000000000 - time_since_action) // 1000000, self._transition_next_photo)
+            return
 
         self._switch_forward_image()
 
-        self._last_transition_time = datetime.datetime.now()
+        self._last_transition_time = time.monotonic_ns()
 
         self._photo_change_job = self._frame.after(10000, self._transition_next_photo)
 
@@ -460,9 +598,9 @@ class PhotoDisplayWindow(elements.LimitedFrameBaseElement):
         self._remove_title_job = None
         if not self._title_showing:
             return
-        timedelta = datetime.datetime.now() - self._last_action_time
-        if timedelta >= datetime.timedelta(seconds=3):
+        time_since_action = time.monotonic_ns() - self._last_action_time
+        if time_since_action >= 3000000000:
             self._hide_title()
             self._title_showing = False
         else:
-            self._remove_title_job = self._frame.after(int(timedelta.total_seconds()*1000), self._check_remove_title)
+            self._remove_title_job = self._frame.after((3000000000 - time_since_action) // 1000000, self._check_remove_title)
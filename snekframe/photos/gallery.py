@@ -10,11 +10,13 @@ import os.path
 import tkinter as tk
 from tkinter import ttk
 
-from .. import elements, params, styles
+from PIL import ImageTk as PIL_ImageTk
+
+from .. import elements, params, settings, styles
 from ..fonts import FONTS
 from ..icons import ICONS
 from ..params import WINDOW_WIDTH, WINDOW_HEIGHT, TITLE_BAR_HEIGHT
-from .container import _FileSystemExplorer, PageDirection, ViewUpdate, ItemViewUpdate, NameViewUpdate, SelectViewUpdate, DirectionsUpdate, FullImageViewUpdate, CommitUpdate
+from .container import _FileSystemExplorer, PageDirection, ItemViewUpdate, NameViewUpdate, SelectViewUpdate, DirectionsUpdate, FullImageViewUpdate, CommitUpdate
 from . import container
 
 class GalleryAlbumButtons(elements.LimitedFrameBaseElement):
@@ -173,7 +175,7 @@ class _PhotoGalleryItemButton(elements._Button):
         self._style = "GalleryItem.Button.TLabel"
         self._album_icon_inactive = ICONS.get("folder", **styles._ICON_STYLES[self._style])
         self._album_icon_active = ICONS.get("folder", **styles._ICON_STYLES[f"Active.{self._style}"])
-        self._album_mode = album_text is not None
+        self._album_mode = None # Set below, icon only changes when switching mode
         self._text= tk.StringVar()
 
         super().__init__(parent, ttk.Label, command, label_kwargs, enabled=enabled, compound="center", justify=tk.CENTER, anchor=tk.CENTER, textvariable=self._text, style=self._style)
@@ -189,31 +191,35 @@ class _PhotoGalleryItemButton(elements._Button):
 
     def _style_normal(self):
         if self._album_mode:
-            self._element.configure(image=self._album_icon_inactive)
+            self._element.configure(image=self._album_icon_inactive, style=self._style)
             self._element.image = self._album_icon_inactive
-        self._element.configure(style=self._style)
+        else:
+            self._element.configure(style=self._style)
 
     def _style_active(self):
         if self._album_mode:
-            self._element.configure(image=self._album_icon_active)
+            self._element.configure(image=self._album_icon_active, style=f"Active.{self._style}")
             self._element.image = self._album_icon_active
-        self._element.configure(style=f"Active.{self._style}")
+        else:
+            self._element.configure(style=f"Active.{self._style}")
 
     def _style_disabled(self):
         self._style_normal()
 
     def set_album_text(self, album_text):
         """Switch button to album"""
-        self._album_mode = True
-        self._element.configure(image=self._album_icon_inactive)
-        self._element.image = self._album_icon_inactive
+        if not self._album_mode:
+            self._album_mode = True
+            self._element.configure(image=self._album_icon_inactive)
+            self._element.image = self._album_icon_inactive
         self._text.set(album_text)
 
     def set_photo_text(self, photo_text):
         """Switch button to photo"""
-        self._album_mode = False
-        self._element.configure(image="")
-        self._element.image = ""
+        if self._album_mode is not False:
+            self._album_mode = False
+            self._element.configure(image="")
+            self._element.image = ""
         self._text.set(photo_text)
 
 class _PhotoGalleryItem(elements.LimitedFrameBaseElement):
@@ -222,7 +228,11 @@ class _PhotoGalleryItem(elements.LimitedFrameBaseElement):
         super().__init__(parent, {})
 
         # Uses enabled to indicate hidden
-        self._select_button = elements.CheckBoxButton(self._frame, select_command, unselect_command, enabled=False)
+        # Only created when selections are first enabled, until then the selection is just kept here
+        self._select_button = None
+        self._select_command = select_command
+        self._unselect_command = unselect_command
+        self._select_button_selection = elements.CheckBoxSelection.Unselected
 
         self._open_button = _PhotoGalleryItemButton(self._frame, open_command, enabled=False, album_text="test")
         self._open_button.place(x=0, y=0, relwidth=1, relheight=1, anchor="nw")
@@ -242,7 +252,8 @@ class _PhotoGalleryItem(elements.LimitedFrameBaseElement):
         self._open_button.enabled = enable
         if enable and not (self._selection_known and self._selections_enabled):
             return
-        self._select_button.enabled = enable
+        if self._select_button is not None:
+            self._select_button.enabled = enable
 
     def _show_button(self, album_text=None, photo_text=None, selection_mode=None):
         if self._visible:
@@ -259,12 +270,14 @@ class _PhotoGalleryItem(elements.LimitedFrameBaseElement):
     def _hide_button(self):
         if self._selection_known:
             self._selection_known = False
-            self._select_button.place_forget()
+            if self._select_button is not None:
+                self._select_button.place_forget()
         if not self._visible:
             return
         self._visible = False
         self._open_button.enabled = False
-        self._select_button.enabled = False
+        if self._select_button is not None:
+            self._select_button.enabled = False
 
     def place(self, album_text=None, photo_text=None, selection_mode=None, **place_kwargs):
         self._show_button(album_text=album_text, photo_text=photo_text, selection_mode=selection_mode)
@@ -293,6 +306,10 @@ class _PhotoGalleryItem(elements.LimitedFrameBaseElement):
             self._select_button.place_forget()
             self._selections_enabled = False
         elif not self._selections_enabled and enable:
+            if self._select_button is None:
+                self._select_button = elements.CheckBoxButton(
+                    self._frame, self._select_command, self._unselect_command, enabled=False, selected=self._select_button_selection
+                )
             self._selections_enabled = True
             self._select_button.enabled = self._selection_known
             if self._selection_known:
@@ -313,13 +330,15 @@ class _PhotoGalleryItem(elements.LimitedFrameBaseElement):
     @selection.setter
     def selection(self, select : container.PhotoDirectorySelection):
         if select == container.PhotoDirectorySelection.Not:
-            self._select_button.selected = elements.CheckBoxSelection.Unselected
+            self._select_button_selection = elements.CheckBoxSelection.Unselected
         elif select == container.PhotoDirectorySelection.Partial:
-            self._select_button.selected = elements.CheckBoxSelection.PartialSelect
+            self._select_button_selection = elements.CheckBoxSelection.PartialSelect
         elif select == container.PhotoDirectorySelection.All:
-            self._select_button.selected = elements.CheckBoxSelection.Selected
+            self._select_button_selection = elements.CheckBoxSelection.Selected
         else:
             raise TypeError()
+        if self._select_button is not None:
+            self._select_button.selected = self._select_button_selection
         if self._selections_enabled:
             if not self._select_button.enabled:
                 self._select_button.enabled = True
@@ -350,31 +369,23 @@ class PhotoGalleryPage(elements.LimitedFrameBaseElement):
         self._frame.grid_rowconfigure(row_phy_index, weight=1)
         self._frame.grid_columnconfigure(column_phy_index, weight=1)
 
-        self._labels : dict[int, dict[int, _PhotoGalleryItem]] = {}
-        def _get_callback(func, index):
-            return lambda: func(index)
+        # Items are only created once something is shown there, directories often fill less than a page
+        self._labels : List[Optional[_PhotoGalleryItem]] = [None] * self.get_photos_per_page() # By index, row * _NUM_COLUMNS + column
+        self._created_labels : List[_PhotoGalleryItem] = []
+        self._shown_labels : dict[int, _PhotoGalleryItem] = {} # By index, only these need hiding or disabling
+        self._label_grid_positions : List[tuple[int, int]] = [] # By index
 
         for row in range(self._NUM_ROWS):
-            self._labels[row] = {}
-
             row_phy_index += 1
             self._frame.grid_rowconfigure(row_phy_index, weight=2)
             column_phy_index = 0
 
             for column in range(self._NUM_COLUMNS):
-                index = row * 3 + column
-                self._labels[row][column] = _PhotoGalleryItem(
-                    self._frame,
-                    _get_callback(self._open_item, index),
-                    _get_callback(self._select_item, index),
-                    _get_callback(self._unselect_item, index)
-                )
-
                 column_phy_index += 1
                 if row == 0:
                     self._frame.grid_columnconfigure(column_phy_index, weight=2)
 
-                self._labels[row][column].grid(row=row_phy_index, column=column_phy_index, sticky="snew")
+                self._label_grid_positions.append((row_phy_index, column_phy_index))
 
                 column_phy_index += 1
                 if row == 0:
@@ -388,6 +399,25 @@ class PhotoGalleryPage(elements.LimitedFrameBaseElement):
 
         self._frame.grid_propagate(False)
 
+    def _get_label(self, index):
+        """Item at the index, created the first time it's needed"""
+        label = self._labels[index]
+        if label is None:
+            label = _PhotoGalleryItem(
+                self._frame,
+                lambda: self._open_item(index),
+                lambda: self._select_item(index),
+                lambda: self._unselect_item(index)
+            )
+            # Grid position is remembered for when it's shown
+            row_phy_index, column_phy_index = self._label_grid_positions[index]
+            label.grid(row=row_phy_index, column=column_phy_index, sticky="snew")
+            label.grid_remove()
+            label.selections_enabled = self._selections_enabled
+            self._labels[index] = label
+            self._created_labels.append(label)
+        return label
+
     def setup_new_page(self, page_id):
         """Reset page with new ID
 
@@ -397,9 +427,9 @@ class PhotoGalleryPage(elements.LimitedFrameBaseElement):
             raise TypeError()
 
         self._current_page_id = page_id
-        for row in self._labels.values():
-            for item in row.values():
-                item.grid_remove()
+        for item in self._shown_labels.values():
+            item.grid_remove()
+        self._shown_labels.clear()
 
     @property
     def page_id(self):
@@ -411,9 +441,8 @@ class PhotoGalleryPage(elements.LimitedFrameBaseElement):
         """Disable buttons"""
         self._current_page_id = None
 
-        for row in self._labels.values():
-            for item in row.values():
-                item.enabled = False
+        for item in self._shown_labels.values():
+            item.enabled = False
 
     def place_forget(self):
         self.disable_page()
@@ -429,14 +458,13 @@ class PhotoGalleryPage(elements.LimitedFrameBaseElement):
         if info.current_page_id != self._current_page_id:
             return
 
-        row = info.index // 3
-        column = info.index % 3
-
         if isinstance(info, NameViewUpdate):
             item_type = "album_text" if info.directory else "photo_text"
-            self._labels[row][column].grid(selection_mode=self._selections_enabled, **{item_type: info.name})
+            label = self._get_label(info.index)
+            label.grid(selection_mode=self._selections_enabled, **{item_type: info.name})
+            self._shown_labels[info.index] = label
         elif isinstance(info, SelectViewUpdate):
-            self._labels[row][column].selection = info.selection
+            self._get_label(info.index).selection = info.selection
         else:
             raise TypeError()
 
@@ -445,17 +473,15 @@ class PhotoGalleryPage(elements.LimitedFrameBaseElement):
             item_selection = container.PhotoDirectorySelection.All
         else:
             item_selection = container.PhotoDirectorySelection.Not
-        for row in self._labels.values():
-            for item in row.values():
-                item.selection = item_selection
+        for item in self._shown_labels.values():
+            item.selection = item_selection
 
     def _open_item(self, index):
         if self._current_page_id is None:
             return
 
-        for row in self._labels.values():
-            for item in row.values():
-                item.enabled = False
+        for item in self._shown_labels.values():
+            item.enabled = False
 
         self._open_item_callback(self._current_page_id, index)
 
@@ -478,9 +504,8 @@ class PhotoGalleryPage(elements.LimitedFrameBaseElement):
     @selections_enabled.setter
     def selections_enabled(self, select : bool):
         self._selections_enabled = select
-        for row in range(self._NUM_ROWS):
-            for column in range(self._NUM_COLUMNS):
-                self._labels[row][column].selections_enabled = select
+        for item in self._created_labels:
+            item.selections_enabled = select
 
 class PhotoDisplayPage(elements.LimitedFrameBaseElement):
     def __init__(self, parent, select_item, unselect_item, selections_enabled):
@@ -531,9 +556,9 @@ class PhotoDisplayPage(elements.LimitedFrameBaseElement):
             return
 
         if isinstance(info, FullImageViewUpdate):
-            self._image = info.image
-            self._photo.configure(image=info.image)
-            self._photo.image = info.image
+            self._image = PIL_ImageTk.PhotoImage(info.image)
+            self._photo.configure(image=self._image)
+            self._photo.image = self._image
         elif isinstance(info, SelectViewUpdate):
             if info.selection == container.PhotoDirectorySelection.All:
                 self._select_button.selected = elements.CheckBoxSelection.Selected
@@ -581,7 +606,13 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
 
     Allows user to select which photos to display
     """
-    def __init__(self, parent : ttk.Frame, photo_container : container.PhotoContainer, regenerate_slideshow): # TODO should pass width
+    _MAX_VIEW_UPDATES = 64 # Per check of the explorer's updates
+    _VIEW_UPDATE_INTERVAL_MS = 200
+    # Explorer only sends updates after a request, so check less often once it has gone quiet
+    _IDLE_VIEW_UPDATE_CHECKS = 5
+    _IDLE_VIEW_UPDATE_INTERVAL_MS = 1000
+
+    def __init__(self, parent : ttk.Frame, photo_container : container.PhotoContainer, settings_container : settings.SettingsContainer, regenerate_slideshow): # TODO should pass width
         super().__init__(parent, {})
 
         self._photo_container = photo_container
@@ -594,11 +625,20 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
         )
         self._title_bar.place(x=0, y=0, width=WINDOW_WIDTH, height=TITLE_BAR_HEIGHT, anchor="nw")
 
-        self._file_explorer = _FileSystemExplorer()
+        self._file_explorer = _FileSystemExplorer(settings_container)
         self._update_view_job = None
+        self._empty_view_update_checks = 0
+        self._view_update_handlers = { # By exact update type
+            NameViewUpdate: self._update_current_window,
+            SelectViewUpdate: self._update_current_window,
+            FullImageViewUpdate: self._update_current_window,
+            DirectionsUpdate: self._update_directions,
+            CommitUpdate: self._update_committed,
+        }
 
         self._page_name : List[str] = []
         self._current_window = None
+        self._no_photos_page = None # Kept to show again if all photos are removed
         self._gallery_loading_windows : List[PhotoGalleryPage] = [] # For loading directory pages
         self._display_loading_windows : List[PhotoDisplayPage] = [] # For loading display pages
 
@@ -611,9 +651,10 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
                 pass
             elif isinstance(self._current_window, PhotoGalleryPage):
                 self._gallery_loading_windows.append(self._current_window)
-                self._current_window = NoPhotosPage(self._frame)
+                self._current_window.place_forget()
+                self._current_window = self._get_no_photos_page()
             elif self._current_window is None:
-                self._current_window = NoPhotosPage(self._frame)
+                self._current_window = self._get_no_photos_page()
             else:
                 raise TypeError()
             self._title_bar.set_button_enables(open_selection_mode=False)
@@ -627,6 +668,8 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
             self._selection_mode = False
 
             if not isinstance(self._current_window, PhotoGalleryPage):
+                if isinstance(self._current_window, NoPhotosPage):
+                    self._current_window.place_forget()
                 if self._gallery_loading_windows:
                     self._current_window = self._gallery_loading_windows.pop()
                     self._current_window.selections_enabled = False
@@ -635,6 +678,7 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
             self._current_window.setup_new_page(new_page_id)
 
             self._title_bar.title = os.path.join(*self._page_name)
+            self._empty_view_update_checks = 0
             self._update_view()
             self._title_bar.set_button_enables(open_selection_mode=True)
         self._current_window.place(x=0, y=TITLE_BAR_HEIGHT, width=WINDOW_WIDTH, height=(WINDOW_HEIGHT - TITLE_BAR_HEIGHT*2), anchor="nw")
@@ -663,6 +707,11 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
 
         super().place_forget()
 
+    def _get_no_photos_page(self):
+        if self._no_photos_page is None:
+            self._no_photos_page = NoPhotosPage(self._frame)
+        return self._no_photos_page
+
     def _generate_new_gallery_page(self):
         return PhotoGalleryPage(self._frame, self._open_item, self._select_item, self._unselect_item, self._selection_mode)
 
@@ -670,37 +719,69 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
         return PhotoDisplayPage(self._frame, self._select_item, self._unselect_item, self._selection_mode)
 
     def _update_view(self, background : bool = True):
-        update = self._file_explorer.get_view_update()
-        if update is not None:
-            if not isinstance(update, ViewUpdate):
-                raise TypeError()
-            if isinstance(update, (NameViewUpdate, SelectViewUpdate, FullImageViewUpdate)):
-                self._current_window.update(update)
-            elif isinstance(update, DirectionsUpdate):
-                if update.selection == container.PhotoDirectorySelection.Not:
-                    update_selection = elements.CheckBoxSelection.Unselected
-                elif update.selection == container.PhotoDirectorySelection.Partial:
-                    update_selection = elements.CheckBoxSelection.PartialSelect
-                elif update.selection == container.PhotoDirectorySelection.All:
-                    update_selection = elements.CheckBoxSelection.Selected
-                elif update.selection is None:
-                    update_selection = None
-                else:
-                    raise TypeError()
-                self._title_bar.set_button_enables(
-                    back=update.backwards,
-                    forward=update.forwards,
-                    up=update.up,
-                    select_all=update_selection
-                )
-            elif isinstance(update, CommitUpdate):
-                if self._selection_committed:
-                    raise Exception()
-                self._selection_committed = True
+        # Handle everything already waiting, up to a limit so redrawing isn't held up
+        get_view_update = self._file_explorer.get_view_update
+        num_updates = 0
+        while num_updates < self._MAX_VIEW_UPDATES:
+            update = get_view_update()
+            if update is None:
+                break
+            self._handle_view_update(update)
+            num_updates += 1
+
+        if num_updates == self._MAX_VIEW_UPDATES:
+            # Likely more waiting, check again as soon as the window has redrawn
+            next_update_ms = 1
+        else:
+            if num_updates > 0:
+                self._empty_view_update_checks = 0
             else:
-                raise TypeError()
+                self._empty_view_update_checks += 1
+            if self._empty_view_update_checks < self._IDLE_VIEW_UPDATE_CHECKS:
+                next_update_ms = self._VIEW_UPDATE_INTERVAL_MS
+            else:
+                next_update_ms = self._IDLE_VIEW_UPDATE_INTERVAL_MS
         if background:
-            self._update_view_job = self._frame.after(200, self._update_view)
+            self._update_view_job = self._frame.after(next_update_ms, self._update_view)
+
+    def _expect_view_updates(self):
+        """Go back to checking at the normal rate after a request to the explorer"""
+        self._empty_view_update_checks = 0
+        if self._update_view_job is not None:
+            self._frame.after_cancel(self._update_view_job)
+            self._update_view_job = self._frame.after(self._VIEW_UPDATE_INTERVAL_MS, self._update_view)
+
+    def _handle_view_update(self, update):
+        handler = self._view_update_handlers.get(type(update))
+        if handler is None:
+            raise TypeError()
+        handler(update)
+
+    def _update_current_window(self, update):
+        self._current_window.update(update)
+
+    def _update_directions(self, update):
+        if update.selection == container.PhotoDirectorySelection.Not:
+            update_selection = elements.CheckBoxSelection.Unselected
+        elif update.selection == container.PhotoDirectorySelection.Partial:
+            update_selection = elements.CheckBoxSelection.PartialSelect
+        elif update.selection == container.PhotoDirectorySelection.All:
+            update_selection = elements.CheckBoxSelection.Selected
+        elif update.selection is None:
+            update_selection = None
+        else:
+            raise TypeError()
+        self._title_bar.set_button_enables(
+            back=update.backwards,
+            forward=update.forwards,
+            up=update.up,
+            select_all=update_selection
+        )
+
+    def _update_committed(self, update):
+        if self._selection_committed:
+            raise Exception()
+        self._selection_committed = True
 
     def _goto_page(self, direction : PageDirection | int, current_page_id : Optional[int] = None):
         """This can be used for next, previous, up, or into
@@ -764,6 +845,7 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
         self._current_window.place(x=0, y=TITLE_BAR_HEIGHT, width=WINDOW_WIDTH, height=(WINDOW_HEIGHT - TITLE_BAR_HEIGHT*2), anchor="nw")
         old_window.place_forget()
 
+        self._empty_view_update_checks = 0
         self._update_view()
 
     def _goto_previous_page(self):
@@ -800,11 +882,13 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
         if not self._selection_mode:
             return
         self._file_explorer.request_selection(current_page_id, index, True)
+        self._expect_view_updates()
 
     def _unselect_item(self, current_page_id, index):
         if not self._selection_mode:
             return
         self._file_explorer.request_selection(current_page_id, index, False)
+        self._expect_view_updates()
 
     def _select_all_photos(self):
         if not self._selection_mode:
@@ -812,6 +896,7 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
         if isinstance(self._current_window, (PhotoGalleryPage, PhotoDisplayPage)):
             self._file_explorer.request_select_all(self._current_window.page_id, True)
             self._current_window.set_select_all(True)
+            self._expect_view_updates()
 
     def _select_no_photos(self):
         if not self._selection_mode:
@@ -819,3 +904,4 @@ class PhotoGalleryWindow(elements.LimitedFrameBaseElement):
         if isinstance(self._current_window, (PhotoGalleryPage, PhotoDisplayPage)):
             self._file_explorer.request_select_all(self._current_window.page_id, False)
             self._current_window.set_select_all(False)
+            self._expect_view_updates()
@@ -74,7 +74,7 @@ class PhotoWindow:
         self._close_current_window()
 
         if self._gallery_window is None:
-            self._gallery_window = PhotoGalleryWindow(self._window, self._photos, self._callback_change_slideshow_window)
+            self._gallery_window = PhotoGalleryWindow(self._window, self._photos, self._settings, self._callback_change_slideshow_window)
         self._gallery_window.place(x=0, y=TITLE_BAR_HEIGHT, anchor="nw", width=WINDOW_WIDTH, height=WINDOW_HEIGHT-TITLE_BAR_HEIGHT)
         self._current_window = self.OpenWindow.Gallery
 
@@ -106,7 +106,7 @@ class PhotoWindow:
     #def _regenerate_slideshow(self):
     def _destroy_photo_window(self, display_window=True, selection_window=True): # TODO
         if self._display_window is not None and display_window:
-            self._display_window.place_forget()
+            self._display_window.close_window()
             del self._display_window
             self._display_window = None
         if self._gallery_window is not None and selection_window:
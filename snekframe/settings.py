@@ -23,6 +23,8 @@ from tkinter import ttk
 
 from sqlalchemy.sql.expression import select, update
 
+from PIL import Image as PIL_Image
+
 class SettingsContainer:
     """Runtime Accessible Settings"""
     def __init__(self):
@@ -38,6 +40,9 @@ class SettingsContainer:
         self._sleep_start_time = result.sleep_start_time
         self._sleep_end_time = result.sleep_end_time
         self._photo_change_time = datetime.timedelta(seconds=result.photo_change_time)
+        self._photo_change_time_ns = result.photo_change_time * 1000000000 # Compared against time.monotonic_ns by the slideshow
+        # Not stored, LANCZOS is noticeably slower to resize with for little visible difference at screen size
+        self._photo_resample_filter = PIL_Image.BICUBIC
 
     def _update_settings(self, **update_kwargs):
         with PERSISTENT_SESSION() as session:
@@ -102,8 +107,25 @@ class SettingsContainer:
             raise TypeError("photo_change_time must be an integer or datetime.delta")
 
         self._photo_change_time = time_delay
+        self._photo_change_time_ns = int_delay * 1000000000
         self._update_settings(photo_change_time=int_delay)
 
+    @property
+    def photo_change_time_ns(self):
+        """Frequency with which photos change in nanoseconds"""
+        return self._photo_change_time_ns
+
+    @property
+    def photo_resample_filter(self):
+        """Filter used when resizing photos for display"""
+        return self._photo_resample_filter
+
+    @photo_resample_filter.setter
+    def photo_resample_filter(self, value):
+        if value not in (PIL_Image.BILINEAR, PIL_Image.BICUBIC, PIL_Image.LANCZOS):
+            raise Exception("photo_resample_filter must be one of BILINEAR, BICUBIC or LANCZOS")
+        self._photo_resample_filter = value
+
 class SettingsMenu(elements.LimitedFrameBaseElement):
     """Sidebar menu for various settings pages"""
     def __init__(self, parent, open_photo_settings, open_system_settings, open_display_settings):